@@ -1,13 +1,32 @@
-import os, json, subprocess, tempfile, uuid, logging, re, asyncio, aiohttp
+import os, subprocess, tempfile, time, uuid, logging, re, asyncio, aiohttp
+from collections import OrderedDict
 from typing import Dict, Any, Optional, List
+import orjson
+try:
+    import uvloop
+    uvloop.install()  # faster event loop for the aiohttp download paths
+except ImportError:
+    pass
+
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.client import Config
 import runpod
 
+from utils import (hwaccel_input_args, hwaccel_encode_args, try_stream_copy,
+                   run_ffmpeg_subclip_batch, run_ffmpeg_segment_copy,
+                   prepare_dense_keyframes, source_keyframe_interval,
+                   load_clips_from_json, ffprobe_duration, COPY_TOLERANCE_S)
+
 AWS_REGION     = os.getenv("AWS_REGION", "us-east-1")
 AWS_S3_BUCKET  = os.getenv("AWS_S3_BUCKET")
 S3_PREFIX_BASE = os.getenv("S3_PREFIX_BASE", "jobs")
 LOG_LEVEL      = os.getenv("LOG_LEVEL","INFO").upper()
+FFMPEG_BATCH   = os.getenv("FFMPEG_BATCH", "0") == "1"  # single filter_complex run instead of per-clip fan-out
+S3_PIPE_UPLOAD = os.getenv("S3_PIPE_UPLOAD", "0") == "1"  # encode to stdout and stream to S3, no local file
+ENC_THREADS    = int(os.getenv("FFMPEG_THREADS_PER_CLIP", "2"))
+KEYFRAME_PREP  = os.getenv("KEYFRAME_PREP", "auto")  # 1 | 0 | auto
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))
 
 logging.basicConfig(level=getattr(logging, LOG_LEVEL, logging.INFO),
                     format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
@@ -18,40 +37,207 @@ if not AWS_S3_BUCKET:
 
 s3 = boto3.client("s3", region_name=AWS_REGION, config=Config(s3={"addressing_style":"virtual"}))
 
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", "16"))
+DOWNLOAD_CHUNK       = 8 << 20  # 8 MiB per read keeps Python-level overhead low
+_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8*1024*1024,
+    multipart_chunksize=16*1024*1024,
+    max_concurrency=DOWNLOAD_CONCURRENCY,
+    use_threads=True,
+)
+
 def s3_key(job_id: str, *parts: str) -> str:
     safe = [p.strip("/").replace("\\","/") for p in parts if p]
     return "/".join([S3_PREFIX_BASE.strip("/"), job_id] + safe)
 
+# Presigned URLs are deterministic per (bucket, key, expiry window); cache them
+# so a job with N clips signs once per object, not once per call. LRU-bounded
+# so a long-lived worker doesn't accumulate one entry per object forever.
+_PRESIGN_CACHE: "OrderedDict[tuple, tuple]" = OrderedDict()
+_PRESIGN_CACHE_MAX = 1024
+_PRESIGN_HEADROOM_S = 600
+
 def presign(bucket: str, key: str, expires: int = 7*24*3600) -> str:
-    return s3.generate_presigned_url("get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=expires)
+    now = time.monotonic()
+    cache_key = (bucket, key, expires)
+    hit = _PRESIGN_CACHE.get(cache_key)
+    if hit and now + _PRESIGN_HEADROOM_S < hit[1]:
+        _PRESIGN_CACHE.move_to_end(cache_key)
+        return hit[0]
+    url = s3.generate_presigned_url("get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=expires)
+    _PRESIGN_CACHE[cache_key] = (url, now + expires)
+    _PRESIGN_CACHE.move_to_end(cache_key)
+    while len(_PRESIGN_CACHE) > _PRESIGN_CACHE_MAX:
+        _PRESIGN_CACHE.popitem(last=False)
+    return url
 
-async def http_download(url: str, dst: str):
-    async with aiohttp.ClientSession() as sess:
-        async with sess.get(url, timeout=aiohttp.ClientTimeout(total=None)) as r:
-            if r.status != 200:
-                raise RuntimeError(f"GET {r.status}: {await r.text()}")
-            os.makedirs(os.path.dirname(dst), exist_ok=True)
-            with open(dst, "wb") as f:
-                async for chunk in r.content.iter_chunked(1<<20):
+# One ClientSession per job: connections (and TLS handshakes) are reused across
+# the clips.json fetch and every video range request. Created lazily on the
+# running loop; _process closes it when the job ends.
+_SESSION: Optional[aiohttp.ClientSession] = None
+
+def _http_session() -> aiohttp.ClientSession:
+    global _SESSION
+    if _SESSION is None or _SESSION.closed:
+        _SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=DOWNLOAD_CONCURRENCY * 2))
+    return _SESSION
+
+async def _close_http_session():
+    global _SESSION
+    if _SESSION is not None and not _SESSION.closed:
+        await _SESSION.close()
+    _SESSION = None
+
+def _fadvise_sequential(fd: int):
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            pass
+
+def _advise_sequential(path: str):
+    """Hint kernel readahead for a file ffmpeg is about to stream through."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        _fadvise_sequential(fd)
+    finally:
+        os.close(fd)
+
+async def _ranged_download(sess: aiohttp.ClientSession, url: str, dst: str, total: int):
+    """Fetch byte ranges in parallel, each writing at its own file offset."""
+    part = max(DOWNLOAD_CHUNK, -(-total // DOWNLOAD_CONCURRENCY))
+    with open(dst, "wb") as f:
+        f.truncate(total)
+
+    async def fetch(lo: int, hi: int):
+        async with sess.get(url, headers={"Range": f"bytes={lo}-{hi}"},
+                            timeout=aiohttp.ClientTimeout(total=None)) as r:
+            if r.status != 206:
+                raise RuntimeError(f"Range GET {r.status}: {await r.text()}")
+            with open(dst, "r+b") as f:
+                f.seek(lo)
+                async for chunk in r.content.iter_chunked(DOWNLOAD_CHUNK):
                     f.write(chunk)
 
+    await asyncio.gather(*(fetch(lo, min(lo + part, total) - 1)
+                           for lo in range(0, total, part)))
+
+async def http_get_bytes(url: str) -> bytes:
+    """Fetch a small resource (e.g. clips.json) into memory, no tempfile."""
+    async with _http_session().get(url, timeout=aiohttp.ClientTimeout(total=None)) as r:
+        if r.status != 200:
+            raise RuntimeError(f"GET {r.status}: {await r.text()}")
+        return await r.read()
+
+async def http_download(url: str, dst: str):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    sess = _http_session()
+    total, ranged = None, False
+    try:
+        async with sess.head(url, allow_redirects=True,
+                             timeout=aiohttp.ClientTimeout(total=30)) as h:
+            if h.status == 200:
+                total = int(h.headers.get("Content-Length") or 0) or None
+                ranged = h.headers.get("Accept-Ranges", "").lower() == "bytes"
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        pass  # server may not support HEAD; fall back to a plain GET
+    if ranged and total and total > DOWNLOAD_CHUNK:
+        await _ranged_download(sess, url, dst, total)
+        return
+    async with sess.get(url, timeout=aiohttp.ClientTimeout(total=None)) as r:
+        if r.status != 200:
+            raise RuntimeError(f"GET {r.status}: {await r.text()}")
+        with open(dst, "wb") as f:
+            _fadvise_sequential(f.fileno())
+            async for chunk in r.content.iter_chunked(DOWNLOAD_CHUNK):
+                f.write(chunk)
+
+# Map every byte outside [a-zA-Z0-9-_.] to '-' in one C-level translate call.
+_SLUG_TABLE = bytes(i if (chr(i).isalnum() or chr(i) in "-_.") else ord("-") for i in range(128)) + b"-" * 128
+_DASH_RUN_RE = re.compile(rb"-{2,}")
+
 def slugify(text: str, maxlen: int = 40) -> str:
-    text = re.sub(r"[^a-zA-Z0-9\-_.]+", "-", (text or "").strip())
-    text = re.sub(r"-{2,}", "-", text).strip("-")
-    return (text[:maxlen] or "clip").lower()
+    # 'replace' turns non-ascii into '?', which the table folds into '-'
+    b = (text or "").strip().encode("ascii", "replace").translate(_SLUG_TABLE)
+    b = _DASH_RUN_RE.sub(b"-", b).strip(b"-")
+    return (b[:maxlen].decode() or "clip").lower()
+
+def _subclip_cmd(src: str, dst: str, start_s: float, end_s: float) -> List[str]:
+    duration = max(0.01, float(end_s) - float(start_s))
+    return [
+        "ffmpeg","-hide_banner","-y",
+        *hwaccel_input_args(),
+        "-ss", f"{start_s:.3f}",
+        "-i", src,
+        "-t", f"{duration:.3f}",
+        *hwaccel_encode_args(23),
+        "-c:a","aac","-b:a","160k",
+        "-movflags","+faststart",
+        "-threads", str(ENC_THREADS),
+        dst
+    ]
 
 def ffmpeg_subclip(src: str, dst: str, start_s: float, end_s: float):
+    if try_stream_copy(src, dst, float(start_s), float(end_s)):
+        return
+    subprocess.check_call(_subclip_cmd(src, dst, start_s, end_s))
+
+_UPLOAD_CONFIG = TransferConfig(multipart_chunksize=8*1024*1024, max_concurrency=4)
+
+def _pipe_subclip_to_s3(src: str, start_s: float, end_s: float, key: str):
+    """Encode straight to a fragmented MP4 on stdout and multipart-upload it,
+    overlapping encode with upload and never touching local disk.
+
+    Fragmented output can't carry +faststart, and there is no local file to
+    verify against, so this path always re-encodes.
+    """
     duration = max(0.01, float(end_s) - float(start_s))
     cmd = [
         "ffmpeg","-hide_banner","-y",
+        *hwaccel_input_args(),
         "-ss", f"{start_s:.3f}",
         "-i", src,
         "-t", f"{duration:.3f}",
-        "-c:v","libx264","-preset","veryfast","-crf","23",
+        *hwaccel_encode_args(23),
         "-c:a","aac","-b:a","160k",
-        dst
+        "-f","mp4","-movflags","+frag_keyframe+empty_moov",
+        "-threads", str(ENC_THREADS),
+        "pipe:1"
     ]
-    subprocess.check_call(cmd)
+    # stderr goes to a spool file so a chatty ffmpeg can't deadlock against
+    # the upload draining stdout; closing stdout first lets ffmpeg exit on
+    # EPIPE if the upload died, so wait() in the finally always reaps it.
+    with tempfile.TemporaryFile() as errf:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errf)
+        try:
+            s3.upload_fileobj(proc.stdout, AWS_S3_BUCKET, key, Config=_UPLOAD_CONFIG)
+        finally:
+            proc.stdout.close()
+            proc.wait()
+        if proc.returncode != 0:
+            # the truncated stream already landed at the canonical key; remove
+            # it so downstream consumers can't fetch a broken clip
+            try:
+                s3.delete_object(Bucket=AWS_S3_BUCKET, Key=key)
+            except Exception:
+                log.warning("failed to delete broken clip s3://%s/%s", AWS_S3_BUCKET, key)
+            errf.seek(0)
+            stderr = errf.read()
+            raise RuntimeError(f"ffmpeg pipe encode failed for {key}\n{stderr.decode(errors='replace')[-8000:]}")
+
+async def encode_one(src: str, dst: str, start_s: float, end_s: float):
+    if await asyncio.to_thread(try_stream_copy, src, dst, start_s, end_s):
+        return
+    proc = await asyncio.create_subprocess_exec(
+        *_subclip_cmd(src, dst, start_s, end_s),
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    _, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed for {dst}\n{stderr.decode(errors='replace')[-8000:]}")
 
 async def ensure_local_video(url_or_path: str) -> str:
     if url_or_path.startswith("http"):
@@ -59,51 +245,163 @@ async def ensure_local_video(url_or_path: str) -> str:
         await http_download(url_or_path, tmp)
         return tmp
     if url_or_path.startswith("s3://"):
-        # s3://bucket/key → presign then download
+        # s3://bucket/key → multipart ranged GET straight from S3
         _, _, rest = url_or_path.partition("s3://")
         bucket, _, key = rest.partition("/")
         tmp = os.path.join(tempfile.gettempdir(), f"input-{uuid.uuid4().hex}.mp4")
-        url = s3.generate_presigned_url("get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=3600)
-        await http_download(url, tmp)
+        await asyncio.to_thread(s3.download_file, bucket, key, tmp, Config=_TRANSFER_CONFIG)
         return tmp
     return url_or_path  # assume local path
 
 async def load_clips_config(job_id: str, clips_json_url: Optional[str]) -> List[Dict[str, Any]]:
     if clips_json_url and clips_json_url.startswith("http"):
-        tmp = os.path.join(tempfile.gettempdir(), f"clips-{uuid.uuid4().hex}.json")
-        await http_download(clips_json_url, tmp)
-        obj = json.loads(open(tmp, "r", encoding="utf-8").read())
+        url = clips_json_url
     else:
-        key = s3_key(job_id, "clips", "clips.json")
-        tmp = os.path.join(tempfile.gettempdir(), f"clips-{uuid.uuid4().hex}.json")
-        url = presign(AWS_S3_BUCKET, key, 3600)
-        await http_download(url, tmp)
-        obj = json.loads(open(tmp, "r", encoding="utf-8").read())
-
-    # normalize to list
-    if isinstance(obj, dict) and "clips" in obj:
-        clips = obj["clips"]
-    elif isinstance(obj, list):
-        clips = obj
-    else:
-        raise ValueError("clips.json must be a list or an object with a 'clips' key")
-
-    norm = []
-    for idx, c in enumerate(clips, start=1):
-        start_s = c.get("start") or c.get("start_s") or c.get("from")
-        end_s   = c.get("end")   or c.get("end_s")   or c.get("to")
-        if start_s is None or end_s is None:
-            # allow duration instead of end
-            dur = c.get("duration")
-            if start_s is not None and dur is not None:
-                end_s = float(start_s) + float(dur)
-        if start_s is None or end_s is None:
-            continue
-        title = c.get("title") or c.get("label") or (c.get("text") or f"clip{idx:03d}")
-        norm.append({"idx": idx, "title": title, "start": float(start_s), "end": float(end_s)})
-    if not norm:
+        url = presign(AWS_S3_BUCKET, s3_key(job_id, "clips", "clips.json"), 3600)
+    windows = load_clips_from_json(orjson.loads(await http_get_bytes(url)), strict=False)
+    if not windows:
         raise ValueError("No valid clips found in clips.json")
-    return norm
+    return windows
+
+def _should_prep_keyframes(windows: List[Dict[str, Any]], src: str) -> bool:
+    """Decide whether one dense-keyframe re-encode of the source pays off.
+
+    The prep pass re-encodes the whole source and costs every clip a
+    generation of quality, so in auto mode it only runs when the requested
+    clips cover most of the source (otherwise re-encoding just the misaligned
+    clips is strictly cheaper) and the source GOP is too sparse for the
+    stream-copy tolerance anyway.
+    """
+    if KEYFRAME_PREP == "0":
+        return False
+    if KEYFRAME_PREP == "1":
+        return True
+    if len(windows) < 4:
+        return False
+    src_duration = ffprobe_duration(src)
+    if src_duration is None or src_duration <= 0:
+        return False
+    clip_coverage = sum(w["end"] - w["start"] for w in windows) / src_duration
+    if clip_coverage < 0.5:
+        return False
+    interval = source_keyframe_interval(src)
+    return interval is None or interval > 2 * COPY_TOLERANCE_S
+
+async def _process(job_id: str, video_url: Optional[str], video_path: Optional[str],
+                   clips_json_url: Optional[str]) -> List[Dict[str, Any]]:
+    try:
+        return await _process_job(job_id, video_url, video_path, clips_json_url)
+    finally:
+        await _close_http_session()
+
+async def _process_job(job_id: str, video_url: Optional[str], video_path: Optional[str],
+                       clips_json_url: Optional[str]) -> List[Dict[str, Any]]:
+    # metadata and media arrive in parallel
+    windows, src_local = await asyncio.gather(
+        load_clips_config(job_id, clips_json_url),
+        ensure_local_video(video_url) if video_url else asyncio.sleep(0, result=video_path),
+    )
+    _advise_sequential(src_local)
+
+    if _should_prep_keyframes(windows, src_local):
+        try:
+            src_local = await asyncio.to_thread(prepare_dense_keyframes, src_local)
+            _advise_sequential(src_local)
+        except RuntimeError:
+            log.warning("keyframe prep failed; cutting from the original source")
+
+    staged = []
+    for w in windows:
+        idx = w["idx"]
+        slug = slugify(w["title"]) if w["title"] else f"clip-{idx:03d}"
+        dst_local = os.path.join(tempfile.gettempdir(), f"{slug}-{idx:03d}.mp4")
+        staged.append((w, slug, dst_local))
+
+    if S3_PIPE_UPLOAD and not FFMPEG_BATCH:
+        sem = asyncio.Semaphore(min(len(staged), max(1, (os.cpu_count() or 2) // ENC_THREADS)))
+
+        async def pipe_one(w, slug):
+            key = s3_key(job_id, "clips", f"{slug}-{w['idx']:03d}.mp4")
+            async with sem:
+                await asyncio.to_thread(_pipe_subclip_to_s3, src_local, w["start"], w["end"], key)
+            return {
+                "index": w["idx"], "title": w["title"], "start": w["start"], "end": w["end"],
+                "key": key, "url": presign(AWS_S3_BUCKET, key), "s3_uri": f"s3://{AWS_S3_BUCKET}/{key}"
+            }
+
+        return list(await asyncio.gather(*(pipe_one(w, slug) for w, slug, _ in staged)))
+
+    async def upload_one(w, slug, dst_local):
+        key = s3_key(job_id, "clips", f"{slug}-{w['idx']:03d}.mp4")
+        await asyncio.to_thread(s3.upload_file, dst_local, AWS_S3_BUCKET, key)
+        return {
+            "index": w["idx"], "title": w["title"], "start": w["start"], "end": w["end"],
+            "key": key, "url": presign(AWS_S3_BUCKET, key), "s3_uri": f"s3://{AWS_S3_BUCKET}/{key}"
+        }
+
+    if FFMPEG_BATCH:
+        # One segment-muxer stream-copy pass cuts every keyframe-aligned clip
+        # in a single decode; whatever misses the tolerance (or overlaps) is
+        # re-encoded in one filter_complex run. Uploads follow since a single
+        # ffmpeg process can't pipeline with them.
+        encode_jobs = [{"dst": dst_local, "start": w["start"], "end": w["end"]}
+                       for w, slug, dst_local in staged]
+        try:
+            encode_jobs = await asyncio.to_thread(run_ffmpeg_segment_copy, src_local, encode_jobs)
+        except ValueError:
+            log.info("clip windows overlap; skipping segment copy")
+        except RuntimeError:
+            log.warning("segment copy failed; re-encoding all clips in batch")
+        if encode_jobs:
+            try:
+                await asyncio.to_thread(run_ffmpeg_subclip_batch, src_local, encode_jobs)
+            except RuntimeError:
+                log.warning("batch subclip failed; falling back to per-clip encode")
+                for j in encode_jobs:
+                    await asyncio.to_thread(ffmpeg_subclip, src_local, j["dst"], j["start"], j["end"])
+        return list(await asyncio.gather(*(upload_one(w, slug, d) for w, slug, d in staged)))
+
+    # Producer/consumer pipeline: encoder workers pull clip windows, uploader
+    # workers pull finished files, so uploads overlap the remaining encodes.
+    # Worker counts bound concurrency (-threads ENC_THREADS per encoder).
+    out_items: List[Optional[Dict[str, Any]]] = [None] * len(staged)
+    encode_q: asyncio.Queue = asyncio.Queue()
+    upload_q: asyncio.Queue = asyncio.Queue()
+    for job in enumerate(staged):
+        encode_q.put_nowait(job)
+    n_enc = min(len(staged), max(1, (os.cpu_count() or 2) // ENC_THREADS))
+    n_up = min(len(staged), UPLOAD_WORKERS)
+
+    async def encoder_worker():
+        while True:
+            job = await encode_q.get()
+            if job is None:
+                break
+            pos, (w, slug, dst_local) = job
+            await encode_one(src_local, dst_local, w["start"], w["end"])
+            upload_q.put_nowait(job)
+
+    async def uploader_worker():
+        while True:
+            job = await upload_q.get()
+            if job is None:
+                break
+            pos, (w, slug, dst_local) = job
+            out_items[pos] = await upload_one(w, slug, dst_local)
+
+    for _ in range(n_enc):
+        encode_q.put_nowait(None)
+    encoders = [asyncio.create_task(encoder_worker()) for _ in range(n_enc)]
+    uploaders = [asyncio.create_task(uploader_worker()) for _ in range(n_up)]
+    try:
+        await asyncio.gather(*encoders)
+        for _ in range(n_up):
+            upload_q.put_nowait(None)
+        await asyncio.gather(*uploaders)
+    finally:
+        for t in encoders + uploaders:
+            t.cancel()
+    return out_items
 
 def handler(event: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -129,35 +427,10 @@ def handler(event: Dict[str, Any]) -> Dict[str, Any]:
         # clips metadata
         clips_json_url = data.get("clips_json_url")
 
-        # load clips windows
-        windows = asyncio.run(load_clips_config(job_id, clips_json_url))
-
-        # get source locally
-        if video_url:
-            src_local = asyncio.run(ensure_local_video(video_url))
-        elif video_path:
-            src_local = video_path
-        else:
+        if not (video_url or video_path):
             return {"error": "Provide video_url (preferred) or video_path."}
 
-        out_items = []
-        for w in windows:
-            idx = w["idx"]
-            title = w["title"]
-            start_s = w["start"]; end_s = w["end"]
-            slug = slugify(title) if title else f"clip-{idx:03d}"
-            dst_local = os.path.join(tempfile.gettempdir(), f"{slug}-{idx:03d}.mp4")
-            ffmpeg_subclip(src_local, dst_local, start_s, end_s)
-
-            key = s3_key(job_id, "clips", f"{slug}-{idx:03d}.mp4")
-            s3.upload_file(dst_local, AWS_S3_BUCKET, key)
-            url = presign(AWS_S3_BUCKET, key)
-
-            out_items.append({
-                "index": idx, "title": title, "start": start_s, "end": end_s,
-                "key": key, "url": url, "s3_uri": f"s3://{AWS_S3_BUCKET}/{key}"
-            })
-
+        out_items = asyncio.run(_process(job_id, video_url, video_path, clips_json_url))
         return {"ok": True, "job_id": job_id, "clips": out_items}
 
     except subprocess.CalledProcessError as e:
@@ -166,4 +439,25 @@ def handler(event: Dict[str, Any]) -> Dict[str, Any]:
         log.exception("handler failed")
         return {"error": str(e)}
 
+class _OrjsonShim:
+    """Drop-in for the json module inside runpod's job pipeline: orjson does
+    the work, output stays str, stdlib-only kwargs are accepted and ignored."""
+    @staticmethod
+    def dumps(obj, **kwargs) -> str:
+        return orjson.dumps(obj, default=str).decode()
+
+    @staticmethod
+    def loads(s, **kwargs):
+        return orjson.loads(s)
+
+# rp_http serializes the job response (json.dumps(job_data, ensure_ascii=False)
+# in send_result as of runpod 1.12); rp_job only json.dumps error payloads.
+# Patch both so large clip lists encode in C either way.
+try:
+    from runpod.serverless.modules import rp_http, rp_job
+    rp_http.json = _OrjsonShim
+    rp_job.json = _OrjsonShim
+except (ImportError, AttributeError):  # framework layout changed; keep stdlib json
+    pass
+
 runpod.serverless.start({"handler": handler})
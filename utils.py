@@ -1,14 +1,79 @@
-import os, re, json, subprocess
+import functools, math, os, re, json, shutil, subprocess, tempfile
 from typing import List, Dict, Any, Optional
 import requests
+from requests.adapters import HTTPAdapter
 
-TIME_RE = re.compile(r"^(?:(\d+):)?([0-5]?\d):([0-5]?\d(?:\.\d+)?)$")  # [hh:]mm:ss[.ms]
+try:
+    import av  # PyAV: in-process remux without per-clip fork/exec
+except ImportError:
+    av = None
+
+# Shared session: connection pooling avoids a fresh TCP+TLS handshake per call.
+_HTTP = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+_HTTP.mount("https://", _ADAPTER)
+_HTTP.mount("http://", _ADAPTER)
+
+TIME_RE = re.compile(r"(?:(\d+):)?([0-5]?\d):([0-5]?\d(?:\.\d+)?)")  # [hh:]mm:ss[.ms], fullmatched
+
+HWACCEL      = os.getenv("HWACCEL", "auto").lower()  # auto | cuda | vaapi | qsv | none
+VAAPI_DEVICE = os.getenv("VAAPI_DEVICE", "/dev/dri/renderD128")
+
+def _ffmpeg_encoders() -> str:
+    try:
+        proc = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        return proc.stdout or ""
+    except OSError:
+        return ""
+
+def detect_hwaccel() -> str:
+    """Pick a hardware encoder ('cuda'/'vaapi'/'qsv') once; 'none' means libx264."""
+    if HWACCEL == "none":
+        return "none"
+    encoders = _ffmpeg_encoders()
+    available = {
+        "cuda":  "h264_nvenc" in encoders,
+        "vaapi": "h264_vaapi" in encoders and os.path.exists(VAAPI_DEVICE),
+        "qsv":   "h264_qsv" in encoders,
+    }
+    if HWACCEL in available:
+        return HWACCEL if available[HWACCEL] else "none"
+    # auto: prefer NVENC on GPU pods, then VAAPI, then QSV
+    for mode in ("cuda", "vaapi", "qsv"):
+        if available[mode]:
+            return mode
+    return "none"
+
+FFMPEG_HWACCEL = detect_hwaccel()
+
+def hwaccel_input_args(mode: Optional[str] = None) -> List[str]:
+    """Input-side ffmpeg flags that keep decoded frames on the accelerator."""
+    mode = FFMPEG_HWACCEL if mode is None else mode
+    if mode == "cuda":
+        return ["-hwaccel", "cuda", "-hwaccel_output_format", "cuda"]
+    if mode == "vaapi":
+        return ["-vaapi_device", VAAPI_DEVICE, "-hwaccel", "vaapi", "-hwaccel_output_format", "vaapi"]
+    if mode == "qsv":
+        return ["-hwaccel", "qsv"]
+    return []
+
+def hwaccel_encode_args(quality: int, mode: Optional[str] = None) -> List[str]:
+    """Video-encoder ffmpeg flags for the selected accelerator; libx264 fallback."""
+    mode = FFMPEG_HWACCEL if mode is None else mode
+    if mode == "cuda":
+        return ["-c:v", "h264_nvenc", "-preset", "p4", "-tune", "hq", "-cq", str(quality)]
+    if mode == "vaapi":
+        return ["-c:v", "h264_vaapi", "-qp", str(quality)]
+    if mode == "qsv":
+        return ["-c:v", "h264_qsv", "-global_quality", str(quality)]
+    return ["-c:v", "libx264", "-preset", "veryfast", "-crf", str(quality)]
 
 def ensure_dir(p: str):
     os.makedirs(p, exist_ok=True)
 
-def download_to(path: str, url: str, chunk=1024*1024):
-    with requests.get(url, stream=True, timeout=60) as r:
+def download_to(path: str, url: str, chunk=8*1024*1024):
+    with _HTTP.get(url, stream=True, timeout=60) as r:
         r.raise_for_status()
         ensure_dir(os.path.dirname(path))
         with open(path, "wb") as f:
@@ -19,13 +84,15 @@ def download_to(path: str, url: str, chunk=1024*1024):
 
 def parse_timecode(t: Any) -> float:
     """Accepts seconds (int/float/str) or 'hh:mm:ss.ms' string."""
-    if isinstance(t, (int, float)):
-        return float(t)
+    try:
+        v = float(t)  # common case: numeric seconds, one C-level conversion
+    except (TypeError, ValueError):
+        pass
+    else:
+        if math.isfinite(v):  # 'inf'/'nan' parse as floats but aren't times
+            return v
     if isinstance(t, str):
-        s = t.strip()
-        if s.replace('.', '', 1).isdigit():
-            return float(s)
-        m = TIME_RE.match(s)
+        m = TIME_RE.fullmatch(t.strip())
         if m:
             h = int(m.group(1)) if m.group(1) else 0
             mnt = int(m.group(2))
@@ -33,12 +100,18 @@ def parse_timecode(t: Any) -> float:
             return h*3600 + mnt*60 + sec
     raise ValueError(f"Unrecognized time format: {t}")
 
-def load_clips_from_json(json_obj: Any) -> List[Dict[str, Any]]:
+_START_KEYS = ("start", "start_s", "from")
+_END_KEYS   = ("end", "end_s", "to")
+
+def load_clips_from_json(json_obj: Any, strict: bool = True) -> List[Dict[str, Any]]:
     """
     Accepts:
       - {"clips":[{"id","start","end","quote"?}, ...]}
       - [{"id","start","end"}, ...]
-    start/end may be seconds or timecode strings.
+    start/end may be seconds or timecode strings; 'duration' may replace 'end'.
+    Normalizes in a single pass to {"id","idx","title","start","end","quote"}.
+    With strict=False, clips missing their time bounds are skipped instead of
+    raising.
     """
     if isinstance(json_obj, dict) and "clips" in json_obj:
         clips = json_obj["clips"]
@@ -49,34 +122,296 @@ def load_clips_from_json(json_obj: Any) -> List[Dict[str, Any]]:
 
     out = []
     for idx, c in enumerate(clips, start=1):
-        start = parse_timecode(c.get("start"))
-        end = parse_timecode(c.get("end")) if c.get("end") is not None else None
-        dur = parse_timecode(c.get("duration")) if c.get("duration") is not None else None
-        if end is None and dur is None:
-            raise ValueError("Each clip needs either 'end' or 'duration'.")
-        if end is None:
-            end = start + dur
+        start = next((c[k] for k in _START_KEYS if c.get(k) is not None), None)
+        end   = next((c[k] for k in _END_KEYS if c.get(k) is not None), None)
+        dur   = c.get("duration")
+        if start is None or (end is None and dur is None):
+            if strict:
+                raise ValueError("Each clip needs 'start' and either 'end' or 'duration'.")
+            continue
+        start = parse_timecode(start)
+        end = parse_timecode(end) if end is not None else start + parse_timecode(dur)
         clip_id = c.get("id") or f"clip{idx:03d}"
+        title = next((c[k] for k in ("title", "label", "text") if c.get(k)), clip_id)
         out.append({
             "id": clip_id,
-            "start": max(0.0, float(start)),
-            "end": max(0.0, float(end)),
+            "idx": idx,
+            "title": title,
+            "start": max(0.0, start),
+            "end": max(0.0, end),
             "quote": c.get("quote", "")
         })
     return out
 
+def ffprobe_duration(path: str) -> Optional[float]:
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        ).stdout.strip()
+        return float(out)
+    except (OSError, ValueError):
+        return None
+
+COPY_TOLERANCE_S = float(os.getenv("COPY_TOLERANCE_S", "0.5"))
+
+def _remux_subclip_av(src: str, dst: str, start_s: float, end_s: float) -> bool:
+    """Seek/demux/remux packets in-process via PyAV, skipping the fork+exec
+    cost of a per-clip ffmpeg. Copy-only; the caller verifies the duration."""
+    try:
+        inp = av.open(src)
+    except Exception:
+        return False
+    try:
+        in_v = inp.streams.video[0]
+        in_a = inp.streams.audio[0] if inp.streams.audio else None
+        # match the ffmpeg paths: moov up front for progressive playback
+        out = av.open(dst, "w", options={"movflags": "+faststart"})
+        streams = {in_v: out.add_stream(template=in_v)}
+        if in_a is not None:
+            streams[in_a] = out.add_stream(template=in_a)
+        inp.seek(int(start_s / in_v.time_base), stream=in_v)
+        shift = {}  # per-stream dts offset so the output starts at zero
+        for pkt in inp.demux(*streams):
+            if pkt.dts is None:
+                continue
+            if (pkt.stream is in_v and pkt.pts is not None
+                    and float(pkt.pts * pkt.time_base) >= end_s):
+                break
+            base = shift.setdefault(pkt.stream, pkt.dts)
+            pkt.dts -= base
+            if pkt.pts is not None:
+                pkt.pts -= base
+            pkt.stream = streams[pkt.stream]
+            out.mux(pkt)
+        out.close()
+        return True
+    except Exception:  # PyAV raises libav-specific errors; any of them means fall back
+        try:
+            os.remove(dst)
+        except OSError:
+            pass
+        return False
+    finally:
+        inp.close()
+
+def try_stream_copy(src: str, dst: str, start_s: float, end_s: float) -> bool:
+    """Cut without re-encoding; only valid when start lands near a keyframe.
+
+    Prefers an in-process PyAV remux, falling back to an ffmpeg input-seek
+    stream copy when PyAV is unavailable. Returns True if the resulting
+    clip's duration is within COPY_TOLERANCE_S of the request; otherwise
+    removes the output and returns False so the caller can re-encode.
+    """
+    ensure_dir(os.path.dirname(dst))
+    duration = max(0.01, end_s - start_s)
+    ok = av is not None and _remux_subclip_av(src, dst, start_s, end_s)
+    if not ok:
+        cmd = [
+            "ffmpeg", "-hide_banner", "-y",
+            "-ss", f"{start_s:.3f}",
+            "-i", src,
+            "-t", f"{duration:.3f}",
+            "-c", "copy",
+            "-avoid_negative_ts", "make_zero",
+            "-movflags", "+faststart",
+            dst
+        ]
+        proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        ok = proc.returncode == 0
+    if ok:
+        actual = ffprobe_duration(dst)
+        if actual is not None and abs(actual - duration) < COPY_TOLERANCE_S:
+            return True
+    try:
+        os.remove(dst)
+    except OSError:
+        pass
+    return False
+
+@functools.lru_cache(maxsize=64)
+def _probe(path: str, mtime: float, size: int) -> Dict[str, Any]:
+    return json.loads(subprocess.check_output(
+        ["ffprobe", "-v", "error", "-print_format", "json",
+         "-show_streams", "-show_format", path]))
+
+def probe_media(path: str) -> Dict[str, Any]:
+    """ffprobe stream/format JSON for path, cached by (path, mtime, size) so a
+    job with N clips parses the source's moov atom once, not N times."""
+    st = os.stat(path)
+    return _probe(path, st.st_mtime, st.st_size)
+
+def source_keyframe_interval(src: str, probe_span_s: float = 30.0) -> Optional[float]:
+    """Median keyframe spacing over the first probe_span_s seconds, or None.
+    Cached per (path, mtime, size) like probe_media."""
+    try:
+        st = os.stat(src)
+    except OSError:
+        return None
+    return _keyframe_interval(src, st.st_mtime, st.st_size, probe_span_s)
+
+@functools.lru_cache(maxsize=64)
+def _keyframe_interval(src: str, mtime: float, size: int, probe_span_s: float) -> Optional[float]:
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+             "-show_entries", "frame=pts_time", "-of", "csv=p=0",
+             "-read_intervals", f"%+{probe_span_s:g}", src],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        ).stdout
+    except OSError:
+        return None
+    times = []
+    for line in out.split():
+        try:
+            times.append(float(line.strip().rstrip(",")))
+        except ValueError:
+            continue
+    if len(times) < 2:
+        return None
+    times.sort()
+    gaps = sorted(b - a for a, b in zip(times, times[1:]))
+    return gaps[len(gaps) // 2]
+
+def prepare_dense_keyframes(src: str, dst: Optional[str] = None, interval_s: float = 1.0) -> str:
+    """One-time re-encode that forces a keyframe every interval_s seconds so
+    later cuts can stream-copy from (nearly) any start point.
+
+    Audio is copied untouched. Returns the prepared file's path.
+    """
+    if dst is None:
+        root, ext = os.path.splitext(src)
+        dst = f"{root}-keyed{ext or '.mp4'}"
+    cmd = [
+        "ffmpeg", "-hide_banner", "-y",
+        *hwaccel_input_args(),
+        "-i", src,
+        *hwaccel_encode_args(20),
+        "-g", "30",
+        "-force_key_frames", f"expr:gte(t,n_forced*{interval_s:g})",
+    ]
+    if FFMPEG_HWACCEL == "cuda":
+        cmd += ["-forced-idr", "1"]  # forced keyframes must be IDR for clean cuts
+    cmd += ["-c:a", "copy", "-movflags", "+faststart", dst]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg keyframe prep failed for {src}\n{proc.stderr[-8000:]}")
+    return dst
+
+def run_ffmpeg_segment_copy(src: str, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Cut every clip in one stream-copy pass with ffmpeg's segment muxer.
+
+    jobs: [{"dst", "start", "end"}, ...]; windows must not overlap (raises
+    ValueError otherwise). The source is split at every clip boundary, wanted
+    segments are moved to their dst and gap segments discarded. Segment cuts
+    snap to keyframes, so each output is verified against COPY_TOLERANCE_S;
+    returns the jobs that missed it so the caller can re-encode just those.
+    """
+    jobs = sorted(jobs, key=lambda j: j["start"])
+    prev_end = 0.0
+    for j in jobs:
+        if j["start"] < prev_end:
+            raise ValueError("segment copy requires non-overlapping clip windows")
+        prev_end = j["end"]
+
+    cuts: List[str] = []
+    for j in jobs:
+        for t in (j["start"], j["end"]):
+            ft = f"{t:.3f}"
+            if float(ft) > 0 and ft not in cuts:
+                cuts.append(ft)
+
+    workdir = tempfile.mkdtemp(prefix="segments-")
+    pattern = os.path.join(workdir, "seg_%05d.mp4")
+    cmd = [
+        "ffmpeg", "-hide_banner", "-y",
+        "-i", src,
+        "-f", "segment",
+        "-segment_times", ",".join(cuts),
+        "-reset_timestamps", "1",
+        "-c", "copy",
+        pattern
+    ]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise RuntimeError(f"ffmpeg segment copy failed\n{proc.stderr[-8000:]}")
+
+    # segment i spans [bounds[i], bounds[i+1]); find each job's start boundary
+    bounds = [0.0] + [float(c) for c in cuts]
+    missed = []
+    for j in jobs:
+        seg = next((pattern % i for i, b in enumerate(bounds)
+                    if abs(b - j["start"]) < 0.0005), None)
+        wanted = max(0.01, j["end"] - j["start"])
+        actual = ffprobe_duration(seg) if seg and os.path.exists(seg) else None
+        if actual is not None and abs(actual - wanted) < COPY_TOLERANCE_S:
+            ensure_dir(os.path.dirname(j["dst"]))
+            os.replace(seg, j["dst"])
+        else:
+            missed.append(j)
+    shutil.rmtree(workdir, ignore_errors=True)
+    return missed
+
+def run_ffmpeg_subclip_batch(src: str, jobs: List[Dict[str, Any]]) -> None:
+    """Cut every clip in one ffmpeg run: decode the source once, then
+    split/trim per output via -filter_complex.
+
+    jobs: [{"dst", "start", "end"}, ...]. The filter graph always re-encodes,
+    so callers should route keyframe-aligned clips through try_stream_copy
+    first and batch only the remainder.
+    """
+    if not jobs:
+        return
+    n = len(jobs)
+    graph = [
+        f"[0:v]split={n}" + "".join(f"[v{i}]" for i in range(1, n + 1)),
+        f"[0:a]asplit={n}" + "".join(f"[a{i}]" for i in range(1, n + 1)),
+    ]
+    # trim/atrim run on CPU frames, so no hwaccel on the input side here.
+    # NVENC/QSV encoders accept software frames directly; h264_vaapi does
+    # not, so each VAAPI branch uploads its frames to the device first.
+    v_tail = ",format=nv12,hwupload" if FFMPEG_HWACCEL == "vaapi" else ""
+    for i, j in enumerate(jobs, start=1):
+        graph.append(f"[v{i}]trim=start={j['start']:.3f}:end={j['end']:.3f},setpts=PTS-STARTPTS{v_tail}[ov{i}]")
+        graph.append(f"[a{i}]atrim=start={j['start']:.3f}:end={j['end']:.3f},asetpts=PTS-STARTPTS[oa{i}]")
+    cmd = ["ffmpeg", "-hide_banner", "-y"]
+    if FFMPEG_HWACCEL == "vaapi":
+        cmd += ["-vaapi_device", VAAPI_DEVICE]
+    cmd += ["-i", src, "-filter_complex", ";".join(graph)]
+    for i, j in enumerate(jobs, start=1):
+        ensure_dir(os.path.dirname(j["dst"]))
+        cmd += [
+            "-map", f"[ov{i}]", "-map", f"[oa{i}]",
+            *hwaccel_encode_args(23),
+            "-c:a", "aac", "-b:a", "160k",
+            "-movflags", "+faststart",
+            j["dst"]
+        ]
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg batch subclip failed\n{proc.stderr[-8000:]}")
+
 def run_ffmpeg_subclip(src: str, dst: str, start_s: float, end_s: float) -> None:
-    """Re-encode for robust clipping independent of keyframes."""
+    """Stream-copy when keyframes allow; re-encode otherwise."""
+    if try_stream_copy(src, dst, start_s, end_s):
+        return
     ensure_dir(os.path.dirname(dst))
     duration = max(0.01, end_s - start_s)
     cmd = [
         "ffmpeg", "-hide_banner", "-y",
+        *hwaccel_input_args(),
         "-ss", f"{start_s:.3f}",
         "-i", src,
         "-t", f"{duration:.3f}",
-        "-vf", "scale=iw:ih:flags=bicubic",
-        "-c:v", "libx264", "-preset", "veryfast", "-crf", "18",
-        "-pix_fmt", "yuv420p",
+    ]
+    if FFMPEG_HWACCEL == "none":
+        # software path only: hw-decoded frames stay on the device, no CPU filters
+        cmd += ["-vf", "scale=iw:ih:flags=bicubic"]
+    cmd += hwaccel_encode_args(18)
+    if FFMPEG_HWACCEL == "none":
+        cmd += ["-pix_fmt", "yuv420p"]
+    cmd += [
         "-c:a", "aac", "-b:a", "128k",
         "-movflags", "+faststart",
         dst